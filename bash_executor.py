@@ -2,15 +2,83 @@
 Safe bash script execution with output capture and error handling.
 """
 
+import asyncio
+import codecs
+import functools
 import subprocess
 import tempfile
 import os
+import re
+import selectors
+import shlex
 import signal
+import sys
 import threading
+import time
+import uuid
 from pathlib import Path
-from typing import NamedTuple, Optional, Union
+from typing import BinaryIO, Callable, NamedTuple, Optional, Union
 from dataclasses import dataclass
 
+# Receives decoded output as it arrives from a running script
+OutputCallback = Callable[[str], None]
+
+# Pipe read size; matches the default Linux pipe capacity
+_READ_CHUNK_SIZE = 64 * 1024
+
+# Linux caps a single argv string at 128 KiB (MAX_ARG_STRLEN)
+_MAX_INLINE_SCRIPT = 128 * 1024
+
+# Let the child write straight into temp files instead of draining pipes
+_CAPTURE_TO_FILE = sys.platform != 'win32'
+
+# Scripts run in their own process group so the whole tree can be signalled;
+# Windows has no setsid/killpg and uses a new console process group instead
+_WINDOWS = os.name == 'nt'
+_CREATION_FLAGS = subprocess.CREATE_NEW_PROCESS_GROUP if _WINDOWS else 0
+
+# Bash built-ins and keywords that are never external dependencies
+_BUILTINS = frozenset({
+    'if', 'then', 'else', 'fi', 'for', 'while', 'do', 'done',
+    'case', 'esac', 'function', 'return', 'exit', 'echo', 'printf',
+})
+
+# Command usage, matched in a single pass over the script. Only simple command
+# words are consumed; substitutions and the name after 'which' or 'command -v'
+# are captured by lookaheads, so every word is still scanned as a simple
+# command in its own right, exactly as separate scans would.
+_DEP_PATTERN = re.compile(
+    r'\b(?P<bare>[\w-]+)(?=\s)'  # Simple command calls
+    r'(?:(?<=which)(?=\s+(?P<which>[\w-]+))'  # which command
+    r'|(?<=command)(?=\s+-v\s+(?P<command>[\w-]+)))?'  # command -v
+    r'|(?:(?<=\$\()|(?<=`))(?=(?P<sub>[\w-]+))'  # Command substitution
+)
+
+# Prepended to every script before execution
+_SAFETY_HEADER = """#!/bin/bash
+
+# Script execution safety measures
+set -euo pipefail  # Exit on error, undefined vars, pipe failures
+
+# Function to handle cleanup on exit
+cleanup() {
+    echo "Script execution finished"
+}
+trap cleanup EXIT
+
+# Script content begins here"""
+
+@functools.lru_cache(maxsize=64)
+def _prepare_script_cached(content: str) -> str:
+    """Combine the safety header with script content (original shebang dropped)."""
+    script_content = content.strip()
+    if script_content.startswith('#!/'):
+        # Remove existing shebang
+        newline = script_content.find('\n')
+        script_content = script_content[newline + 1:] if newline != -1 else ''
+    
+    return f"{_SAFETY_HEADER}\n\n{script_content}"
+
 @dataclass
 class ExecutionResult:
     """Result of script execution."""
@@ -23,34 +91,59 @@ class ExecutionResult:
 class BashExecutor:
     """Executes bash scripts safely with proper isolation and monitoring."""
     
-    def __init__(self, timeout: int = 30, working_dir: Optional[Path] = None):
+    def __init__(self, timeout: int = 30, working_dir: Optional[Path] = None,
+                 persistent: bool = False):
         self.timeout = timeout
         self.working_dir = working_dir or Path.cwd()
-        self.current_process: Optional[subprocess.Popen] = None
+        self.current_process: Optional[asyncio.subprocess.Process] = None
+        
+        # Long-lived bash for execute_command (POSIX only), started on first use
+        if persistent and _WINDOWS:
+            raise ValueError("persistent mode is not supported on Windows")
+        self.persistent = persistent
+        self._persistent: Optional[subprocess.Popen] = None
+        
+        # Environment for scripts, built once; BASH_ENV=/dev/null prevents
+        # sourcing the user's bash config
+        self._child_env = {**os.environ, 'BASH_ENV': '/dev/null'}
         
     def execute(self, script_content: str, timeout: Optional[int] = None) -> ExecutionResult:
         """Execute bash script content and return results."""
+        return asyncio.run(self.execute_async(script_content, timeout))
+    
+    def execute_streaming(self, script_content: str, on_stdout: OutputCallback,
+                          on_stderr: OutputCallback, timeout: Optional[int] = None) -> ExecutionResult:
+        """Execute bash script content, passing output to the callbacks as it arrives."""
+        return asyncio.run(self.execute_async(script_content, timeout, on_stdout, on_stderr))
+    
+    async def execute_async(self, script_content: str, timeout: Optional[int] = None,
+                            on_stdout: Optional[OutputCallback] = None,
+                            on_stderr: Optional[OutputCallback] = None) -> ExecutionResult:
+        """Execute bash script content without blocking the event loop."""
         if not script_content.strip():
             raise ValueError("Script content cannot be empty")
         
         timeout = timeout or self.timeout
+        prepared = self._prepare_script(script_content)
+        prepared_bytes = prepared.encode('utf-8')
         
-        # Create temporary script file
-        with tempfile.NamedTemporaryFile(
-            mode='w',
-            suffix='.sh',
-            delete=False,
-            encoding='utf-8'
-        ) as temp_file:
-            temp_file.write(self._prepare_script(script_content))
-            temp_script_path = temp_file.name
+        # Hand the script to bash in memory; stdin stays free for the script
+        if len(prepared_bytes) < _MAX_INLINE_SCRIPT:
+            return await self._run_script_async(['-c', prepared], timeout, on_stdout, on_stderr)
+        
+        # Too large for a single argument, fall back to a temporary script file.
+        # bash reads it as an argument, so it needs no execute bit.
+        fd, temp_script_path = tempfile.mkstemp(suffix='.sh')
+        try:
+            os.write(fd, prepared_bytes)
+        finally:
+            os.close(fd)
         
         try:
-            # Make script executable
-            os.chmod(temp_script_path, 0o755)
-            
             # Execute script
-            result = self._run_script(temp_script_path, timeout)
+            result = await self._run_script_async(
+                [temp_script_path], timeout, on_stdout, on_stderr
+            )
             
         finally:
             # Clean up temporary file
@@ -61,89 +154,194 @@ class BashExecutor:
         
         return result
     
+    def set_env(self, key: str, value: Optional[str]) -> None:
+        """Set an environment variable for executed scripts (None removes it)."""
+        if value is None:
+            self._child_env.pop(key, None)
+        else:
+            self._child_env[key] = value
+        
+        # Respawn the persistent shell so it picks up the new environment
+        self._stop_persistent_shell()
+    
     def execute_command(self, command: str, timeout: Optional[int] = None) -> ExecutionResult:
         """Execute a single bash command."""
+        if self.persistent:
+            return self._run_persistent(command, timeout or self.timeout)
         return self.execute(command, timeout)
     
+    def _persistent_shell(self) -> subprocess.Popen:
+        """Get the persistent bash co-process, starting it if needed."""
+        if self._persistent is None or self._persistent.poll() is not None:
+            self._persistent = subprocess.Popen(
+                ['/bin/bash', '--norc', '--noprofile', '-s'],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                bufsize=0,
+                cwd=str(self.working_dir),
+                env=self._child_env,
+                start_new_session=True,
+                creationflags=_CREATION_FLAGS
+            )
+        return self._persistent
+    
+    def _stop_persistent_shell(self):
+        """Kill the persistent bash co-process, if one is running."""
+        if self._persistent is None:
+            return
+        
+        try:
+            self._terminate_group(self._persistent, force=True)
+        except (OSError, ProcessLookupError):
+            pass
+        self._persistent.wait()
+        for stream in (self._persistent.stdin, self._persistent.stdout, self._persistent.stderr):
+            stream.close()
+        self._persistent = None
+    
+    def _run_persistent(self, command: str, timeout: int) -> ExecutionResult:
+        """Run a command in the persistent shell, avoiding a fresh bash startup."""
+        start_time = time.perf_counter()
+        
+        if not command.strip():
+            raise ValueError("Command cannot be empty")
+        
+        # Each command runs in a subshell so exit, set -e or cd cannot affect
+        # the shell itself. The command is passed to eval as one quoted word,
+        # so it is data to the shell: a stray ')' cannot close the subshell
+        # and unterminated quotes or here-documents fail inside eval instead
+        # of leaving the shell waiting for more input. A unique token on
+        # both streams marks the end.
+        token = f"__BASH_CLI_DONE_{uuid.uuid4().hex}__"
+        token_bytes = token.encode()
+        wrapped = (
+            f"( set -euo pipefail; eval -- {shlex.quote(command)} ) < /dev/null\n"
+            f"printf '%s %d\\n' {token} \"$?\"\n"
+            f"printf '%s\\n' {token} >&2\n"
+        )
+        
+        try:
+            shell = self._persistent_shell()
+            shell.stdin.write(wrapped.encode('utf-8'))
+            
+            buffers = {shell.stdout: bytearray(), shell.stderr: bytearray()}
+            with selectors.DefaultSelector() as selector:
+                for stream in buffers:
+                    selector.register(stream, selectors.EVENT_READ)
+                
+                while selector.get_map():
+                    remaining = start_time + timeout - time.perf_counter()
+                    events = selector.select(remaining) if remaining > 0 else []
+                    if not events:
+                        self._stop_persistent_shell()
+                        return ExecutionResult(
+                            returncode=-1,
+                            stdout="",
+                            stderr=f"Command execution timed out after {timeout} seconds",
+                            execution_time=time.perf_counter() - start_time,
+                            timeout=True
+                        )
+                    
+                    for key, _ in events:
+                        buffer = buffers[key.fileobj]
+                        chunk = os.read(key.fd, _READ_CHUNK_SIZE)
+                        buffer += chunk
+                        if not chunk or token_bytes in buffer[-(len(chunk) + len(token_bytes)):]:
+                            selector.unregister(key.fileobj)
+            
+            stdout, stderr = buffers[shell.stdout], buffers[shell.stderr]
+            stdout_end = stdout.find(token_bytes)
+            if stdout_end == -1:
+                # The shell itself went away (e.g. kill $$); start fresh next time
+                returncode = shell.wait()
+                self._stop_persistent_shell()
+            else:
+                returncode = int(stdout[stdout_end + len(token_bytes):].split()[0])
+                stdout = stdout[:stdout_end]
+            
+            stderr_end = stderr.find(token_bytes)
+            if stderr_end != -1:
+                stderr = stderr[:stderr_end]
+            
+            return ExecutionResult(
+                returncode=returncode,
+                stdout=stdout.decode('utf-8', errors='replace'),
+                stderr=stderr.decode('utf-8', errors='replace'),
+                execution_time=time.perf_counter() - start_time,
+                timeout=False
+            )
+            
+        except Exception as e:
+            self._stop_persistent_shell()
+            return ExecutionResult(
+                returncode=-1,
+                stdout="",
+                stderr=f"Execution error: {str(e)}",
+                execution_time=time.perf_counter() - start_time,
+                timeout=False
+            )
+    
     def _prepare_script(self, content: str) -> str:
         """Prepare script content with safety measures and error handling."""
-        # Add shebang if not present
-        lines = content.strip().split('\n')
-        if not lines[0].startswith('#!'):
-            lines.insert(0, '#!/bin/bash')
-        
-        # Add safety measures
-        safety_header = [
-            '#!/bin/bash',
-            '',
-            '# Script execution safety measures',
-            'set -euo pipefail  # Exit on error, undefined vars, pipe failures',
-            '',
-            '# Function to handle cleanup on exit',
-            'cleanup() {',
-            '    echo "Script execution finished"',
-            '}',
-            'trap cleanup EXIT',
-            '',
-            '# Script content begins here',
-        ]
-        
-        # Combine safety header with original content (skip original shebang if present)
-        script_content = content.strip()
-        if script_content.startswith('#!/'):
-            # Remove existing shebang
-            script_content = '\n'.join(script_content.split('\n')[1:])
-        
-        return '\n'.join(safety_header + ['', script_content])
-    
-    def _run_script(self, script_path: str, timeout: int) -> ExecutionResult:
+        return _prepare_script_cached(content)
+    
+    async def _run_script_async(self, bash_args: list[str], timeout: int,
+                                on_stdout: Optional[OutputCallback] = None,
+                                on_stderr: Optional[OutputCallback] = None) -> ExecutionResult:
         """Run the script and capture output."""
-        import time
-        start_time = time.time()
+        start_time = time.perf_counter()
+        capture_files: Optional[tuple[BinaryIO, BinaryIO]] = None
         
         try:
-            # Set up environment
-            env = os.environ.copy()
-            env['BASH_ENV'] = '/dev/null'  # Prevent sourcing user's bash config
+            stdout_target = stderr_target = asyncio.subprocess.PIPE
+            streaming = on_stdout is not None or on_stderr is not None
+            if _CAPTURE_TO_FILE and not streaming:
+                capture_files = self._capture_files()
+                stdout_target, stderr_target = capture_files
             
             # Execute script
-            self.current_process = subprocess.Popen(
-                ['/bin/bash', script_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
+            self.current_process = await asyncio.create_subprocess_exec(
+                '/bin/bash', *bash_args,
+                stdout=stdout_target,
+                stderr=stderr_target,
                 cwd=str(self.working_dir),
-                env=env,
-                preexec_fn=os.setsid  # Create new process group
+                env=self._child_env,
+                start_new_session=True,  # Create new process group
+                creationflags=_CREATION_FLAGS
             )
             
             try:
-                stdout, stderr = self.current_process.communicate(timeout=timeout)
-                execution_time = time.time() - start_time
+                stdout, stderr, returncode = await asyncio.wait_for(
+                    self._collect_output(self.current_process, capture_files,
+                                         on_stdout, on_stderr),
+                    timeout=timeout
+                )
+                execution_time = time.perf_counter() - start_time
                 
                 return ExecutionResult(
-                    returncode=self.current_process.returncode,
+                    returncode=returncode,
                     stdout=stdout,
                     stderr=stderr,
                     execution_time=execution_time,
                     timeout=False
                 )
                 
-            except subprocess.TimeoutExpired:
+            except asyncio.TimeoutError:
                 # Kill the process group
                 try:
-                    os.killpg(os.getpgid(self.current_process.pid), signal.SIGTERM)
+                    self._terminate_group(self.current_process)
                     # Give it a chance to terminate gracefully
                     try:
-                        self.current_process.wait(timeout=5)
-                    except subprocess.TimeoutExpired:
+                        await asyncio.wait_for(self.current_process.wait(), timeout=5)
+                    except asyncio.TimeoutError:
                         # Force kill if it doesn't terminate
-                        os.killpg(os.getpgid(self.current_process.pid), signal.SIGKILL)
-                        self.current_process.wait()
+                        self._terminate_group(self.current_process, force=True)
+                        await self.current_process.wait()
                 except (OSError, ProcessLookupError):
                     pass
                 
-                execution_time = time.time() - start_time
+                execution_time = time.perf_counter() - start_time
                 
                 return ExecutionResult(
                     returncode=-1,
@@ -154,7 +352,7 @@ class BashExecutor:
                 )
                 
         except Exception as e:
-            execution_time = time.time() - start_time
+            execution_time = time.perf_counter() - start_time
             return ExecutionResult(
                 returncode=-1,
                 stdout="",
@@ -164,78 +362,135 @@ class BashExecutor:
             )
         finally:
             self.current_process = None
+            if capture_files is not None:
+                for capture_file in capture_files:
+                    capture_file.close()
+    
+    @staticmethod
+    def _terminate_group(process: Union[subprocess.Popen, asyncio.subprocess.Process],
+                         force: bool = False):
+        """Ask a process group to exit (SIGTERM), or kill it outright with force."""
+        if _WINDOWS:
+            if force:
+                process.kill()
+            else:
+                process.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            os.killpg(os.getpgid(process.pid), signal.SIGKILL if force else signal.SIGTERM)
+    
+    @staticmethod
+    def _capture_files() -> tuple[BinaryIO, BinaryIO]:
+        """Open fresh stdout/stderr capture files for a single run.
+        
+        Each run gets its own pair, so concurrent runs and background jobs
+        left behind by earlier runs never write into another run's output.
+        """
+        stdout_file = tempfile.TemporaryFile(buffering=0)
+        try:
+            return stdout_file, tempfile.TemporaryFile(buffering=0)
+        except BaseException:
+            stdout_file.close()
+            raise
+    
+    async def _collect_output(self, process: asyncio.subprocess.Process,
+                              capture_files: Optional[tuple[BinaryIO, BinaryIO]] = None,
+                              on_stdout: Optional[OutputCallback] = None,
+                              on_stderr: Optional[OutputCallback] = None) -> tuple[str, str, int]:
+        """Wait for the process and return its decoded stdout, stderr and exit code."""
+        if capture_files is not None:
+            # Output went to the capture files
+            returncode = await process.wait()
+            stdout_file, stderr_file = capture_files
+            return self._read_capture(stdout_file), self._read_capture(stderr_file), returncode
+        
+        return await asyncio.gather(
+            self._drain_stream(process.stdout, on_stdout),
+            self._drain_stream(process.stderr, on_stderr),
+            process.wait(),
+        )
+    
+    @staticmethod
+    def _read_capture(capture_file: BinaryIO) -> str:
+        """Read back everything the child wrote to a capture file."""
+        capture_file.seek(0)
+        return capture_file.read().decode('utf-8', errors='replace')
+    
+    @staticmethod
+    async def _drain_stream(stream: asyncio.StreamReader,
+                            on_output: Optional[OutputCallback] = None) -> str:
+        """Read a pipe to EOF in fixed-size chunks and decode it once."""
+        buffer = bytearray()
+        # Incremental decoding keeps multi-byte characters split across chunks intact
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while True:
+            chunk = await stream.read(_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            buffer += chunk
+            if on_output:
+                text = decoder.decode(chunk)
+                if text:
+                    on_output(text)
+        
+        if on_output:
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                on_output(tail)
+        
+        return buffer.decode('utf-8', errors='replace')
     
     def interrupt_execution(self):
         """Interrupt current script execution."""
         if self.current_process:
             try:
-                # Send SIGINT to process group
-                os.killpg(os.getpgid(self.current_process.pid), signal.SIGINT)
+                # Send SIGINT (CTRL_BREAK_EVENT on Windows) to process group
+                if _WINDOWS:
+                    self.current_process.send_signal(signal.CTRL_BREAK_EVENT)
+                else:
+                    os.killpg(os.getpgid(self.current_process.pid), signal.SIGINT)
             except (OSError, ProcessLookupError):
                 pass
+        
+        self._stop_persistent_shell()
+    
+    def __del__(self):
+        if getattr(self, '_persistent', None) is not None:
+            self._stop_persistent_shell()
     
     def validate_script_syntax(self, script_content: str) -> tuple[bool, str]:
         """Validate bash script syntax without executing it."""
         if not script_content.strip():
             return False, "Script content is empty"
         
-        with tempfile.NamedTemporaryFile(
-            mode='w',
-            suffix='.sh',
-            delete=False,
-            encoding='utf-8'
-        ) as temp_file:
-            temp_file.write(script_content)
-            temp_script_path = temp_file.name
-        
         try:
-            # Use bash -n to check syntax without execution
+            # Use bash -n to check syntax without execution; the script is
+            # piped in, so nothing touches the filesystem
             result = subprocess.run(
-                ['/bin/bash', '-n', temp_script_path],
+                ['/bin/bash', '-n'],
+                input=script_content.encode('utf-8'),
                 capture_output=True,
-                text=True,
                 timeout=10
             )
             
             if result.returncode == 0:
                 return True, "Syntax is valid"
             else:
-                return False, result.stderr.strip() or "Syntax error detected"
+                stderr = result.stderr.decode('utf-8', errors='replace')
+                return False, stderr.strip() or "Syntax error detected"
                 
         except subprocess.TimeoutExpired:
             return False, "Syntax check timed out"
         except Exception as e:
             return False, f"Syntax check failed: {str(e)}"
-        finally:
-            try:
-                os.unlink(temp_script_path)
-            except OSError:
-                pass
     
     def get_script_dependencies(self, script_content: str) -> list[str]:
         """Analyze script to identify external command dependencies."""
         dependencies = set()
         
-        # Common patterns for command usage
-        import re
-        
-        # Direct command calls
-        command_patterns = [
-            r'\b([\w-]+)\s+',  # Simple command calls
-            r'which\s+([\w-]+)',  # which command
-            r'command\s+-v\s+([\w-]+)',  # command -v
-            r'\$\(([\w-]+)',  # Command substitution
-            r'`([\w-]+)',  # Backtick command substitution
-        ]
-        
-        for pattern in command_patterns:
-            matches = re.findall(pattern, script_content)
-            for match in matches:
-                if isinstance(match, tuple):
-                    match = match[0]
+        for match in _DEP_PATTERN.finditer(script_content):
+            for name in match.group('bare', 'which', 'command', 'sub'):
                 # Filter out bash built-ins and common keywords
-                if match not in ['if', 'then', 'else', 'fi', 'for', 'while', 'do', 'done', 
-                               'case', 'esac', 'function', 'return', 'exit', 'echo', 'printf']:
-                    dependencies.add(match)
+                if name and name not in _BUILTINS:
+                    dependencies.add(name)
         
-        return sorted(list(dependencies))
+        return sorted(dependencies)
@@ -3,32 +3,34 @@ Interactive CLI interface for the bash script tool.
 Handles user interaction, command parsing, and coordination between components.
 """
 
+import hashlib
 import os
 import sys
+from itertools import chain
 from pathlib import Path
-from typing import Optional, List, Dict, Any
-from prompt_toolkit import prompt
+from typing import Optional, List, Dict, Any, Tuple
+from prompt_toolkit import PromptSession, prompt
 from prompt_toolkit.history import InMemoryHistory
 from prompt_toolkit.completion import WordCompleter
 from prompt_toolkit.shortcuts import confirm
-from prompt_toolkit.formatted_text import HTML
-from rich.console import Console
+from prompt_toolkit.formatted_text import FormattedText
 from rich.syntax import Syntax
 from rich.panel import Panel
+from rich.segment import Segment, Segments
 from rich.table import Table
 from rich.text import Text
 
 from script_manager import ScriptManager
 from bash_executor import BashExecutor
 from syntax_highlighter import BashSyntaxHighlighter
-from utils import format_error, format_success, format_info
+from utils import CONSOLE, format_error, format_success, format_info
 
 class BashScriptCLI:
     """Main CLI interface for the bash script tool."""
     
     def __init__(self, script_dir: Path):
         self.script_dir = script_dir
-        self.console = Console()
+        self.console = CONSOLE
         self.script_manager = ScriptManager(script_dir)
         self.bash_executor = BashExecutor()
         self.syntax_highlighter = BashSyntaxHighlighter()
@@ -38,6 +40,12 @@ class BashScriptCLI:
         self.current_script: Optional[str] = None
         self.current_script_name: Optional[str] = None
         self.script_lines: List[str] = []
+        self._script_text_cache: Optional[str] = None
+        # Digest of the content last saved or loaded, for unsaved-change checks
+        self._saved_hash: Optional[bytes] = None
+        
+        # Rendered script panels keyed by (content, title, width), oldest first
+        self._syntax_cache: Dict[Tuple[str, str, int], List[List[Segment]]] = {}
         
         # Command completer
         self.commands = [
@@ -46,6 +54,13 @@ class BashScriptCLI:
         ]
         self.completer = WordCompleter(self.commands)
         
+        # Prompt sessions reused across the command loop and the line editor
+        self.session = PromptSession(history=self.history, completer=self.completer)
+        self.edit_session = PromptSession(history=self.history)
+        
+        # Static part of the main prompt, as a (style, text) fragment
+        self._prompt_prefix = ('ansigreen', 'bash-cli')
+        
     def run(self):
         """Main CLI loop."""
         self.show_welcome()
@@ -56,10 +71,8 @@ class BashScriptCLI:
                 status = self._get_status()
                 
                 # Get user input
-                user_input = prompt(
-                    HTML(f"<ansigreen>bash-cli</ansigreen> {status}> "),
-                    history=self.history,
-                    completer=self.completer,
+                user_input = self.session.prompt(
+                    FormattedText([self._prompt_prefix, ('', f" {status}> ")])
                 ).strip()
                 
                 if not user_input:
@@ -187,6 +200,8 @@ Type [yellow]:done[/yellow] to finish editing, [yellow]:cancel[/yellow] to cance
         
         self.current_script_name = name
         self.script_lines = []
+        self._script_text_cache = None
+        self._saved_hash = None
         self.console.print(format_success(f"Created new script: {name}"))
         self._edit_current_script()
     
@@ -199,6 +214,8 @@ Type [yellow]:done[/yellow] to finish editing, [yellow]:cancel[/yellow] to cance
             content = self.script_manager.load_script(name)
             self.current_script_name = name
             self.script_lines = content.split('\n')
+            self._script_text_cache = content
+            self._saved_hash = self._hash_content(content)
             self.console.print(format_success(f"Loaded script: {name}"))
             self._edit_current_script()
         except FileNotFoundError:
@@ -223,10 +240,11 @@ Type [yellow]:done[/yellow] to finish editing, [yellow]:cancel[/yellow] to cance
         
         while True:
             try:
-                line = prompt(f"[{len(temp_lines) + 1:2}] ", history=self.history).rstrip()
+                line = self.edit_session.prompt(f"[{len(temp_lines) + 1:2}] ").rstrip()
                 
                 if line == ':done':
                     self.script_lines = temp_lines
+                    self._script_text_cache = None
                     self.console.print(format_success("Script editing completed."))
                     break
                 elif line == ':cancel':
@@ -260,8 +278,10 @@ Type [yellow]:done[/yellow] to finish editing, [yellow]:cancel[/yellow] to cance
             self.current_script_name = name
         
         try:
-            content = '\n'.join(self.script_lines)
+            content = self._script_text()
             self.script_manager.save_script(self.current_script_name, content)
+            self.script_manager.flush_metadata()
+            self._saved_hash = self._hash_content(content)
             self.console.print(format_success(f"Script saved: {self.current_script_name}"))
         except Exception as e:
             self.console.print(format_error(f"Failed to save script: {e}"))
@@ -275,6 +295,8 @@ Type [yellow]:done[/yellow] to finish editing, [yellow]:cancel[/yellow] to cance
             content = self.script_manager.load_script(name)
             self.current_script_name = name
             self.script_lines = content.split('\n')
+            self._script_text_cache = content
+            self._saved_hash = self._hash_content(content)
             self.console.print(format_success(f"Loaded script: {name}"))
             self._show_current_script()
         except FileNotFoundError:
@@ -297,9 +319,9 @@ Type [yellow]:done[/yellow] to finish editing, [yellow]:cancel[/yellow] to cance
             
             for script_info in scripts:
                 table.add_row(
-                    script_info['name'],
-                    script_info['size'],
-                    script_info['modified']
+                    script_info.name,
+                    script_info.size,
+                    script_info.modified
                 )
             
             self.console.print(table)
@@ -316,12 +338,15 @@ Type [yellow]:done[/yellow] to finish editing, [yellow]:cancel[/yellow] to cance
             
             if confirm(f"Delete script '{name}'?"):
                 self.script_manager.delete_script(name)
+                self.script_manager.flush_metadata()
                 self.console.print(format_success(f"Script '{name}' deleted."))
                 
                 # Clear current script if it was the deleted one
                 if self.current_script_name == name:
                     self.current_script_name = None
                     self.script_lines = []
+                    self._script_text_cache = None
+                    self._saved_hash = None
                     
         except Exception as e:
             self.console.print(format_error(f"Failed to delete script: {e}"))
@@ -332,7 +357,7 @@ Type [yellow]:done[/yellow] to finish editing, [yellow]:cancel[/yellow] to cance
             self.console.print(format_error("No script to run. Create or load a script first."))
             return
         
-        content = '\n'.join(self.script_lines)
+        content = self._script_text()
         self._execute_script_content(content, self.current_script_name or "current")
     
     def _execute_script(self, name: str):
@@ -354,31 +379,35 @@ Type [yellow]:done[/yellow] to finish editing, [yellow]:cancel[/yellow] to cance
         self.console.print(format_info(f"Executing script: {name}"))
         
         # Show script content with syntax highlighting
-        syntax = Syntax(content, "bash", theme="monokai", line_numbers=True)
-        panel = Panel(syntax, title=f"Script: {name}", border_style="blue")
-        self.console.print(panel)
+        self.console.print(self._script_panel(content, f"Script: {name}"))
         
         # Confirm execution for safety
         if not confirm("Execute this script?"):
             self.console.print(format_info("Execution cancelled."))
             return
         
+        # Stream output as it arrives; stderr in red
+        streamed_errors = []
+        
+        def on_stdout(text: str):
+            self.console.out(text, end='', highlight=False)
+        
+        def on_stderr(text: str):
+            streamed_errors.append(text)
+            self.console.out(text, style="red", end='', highlight=False)
+        
         try:
-            result = self.bash_executor.execute(content)
-            
-            # Display results
             self.console.print("\n" + "="*60)
-            self.console.print(format_success("Execution completed"))
-            
-            if result.stdout:
-                self.console.print("\n[bold green]Output:[/bold green]")
-                self.console.print(result.stdout)
+            result = self.bash_executor.execute_streaming(content, on_stdout, on_stderr)
             
-            if result.stderr:
-                self.console.print("\n[bold red]Errors:[/bold red]")
-                self.console.print(result.stderr)
+            # Timeouts and launch failures are reported only in the result
+            if result.timeout or (result.stderr and not streamed_errors):
+                self.console.print(format_error(result.stderr))
             
-            self.console.print(f"\n[bold]Exit code:[/bold] {result.returncode}")
+            # Display results
+            self.console.print()
+            self.console.print(format_success("Execution completed"))
+            self.console.print(f"[bold]Exit code:[/bold] {result.returncode}")
             self.console.print("="*60)
             
         except Exception as e:
@@ -398,12 +427,24 @@ Type [yellow]:done[/yellow] to finish editing, [yellow]:cancel[/yellow] to cance
             self.console.print(format_info("Script is empty."))
             return
         
-        content = '\n'.join(lines)
-        syntax = Syntax(content, "bash", theme="monokai", line_numbers=True)
-        
+        content = self._script_text() if lines is self.script_lines else '\n'.join(lines)
         title = f"Script: {self.current_script_name}" if self.current_script_name else "Current Script"
-        panel = Panel(syntax, title=title, border_style="blue")
-        self.console.print(panel)
+        self.console.print(self._script_panel(content, title))
+    
+    def _script_panel(self, content: str, title: str) -> Segments:
+        """Render a syntax-highlighted script panel, reusing earlier renders."""
+        key = (content, title, self.console.width)
+        lines = self._syntax_cache.get(key)
+        if lines is None:
+            syntax = Syntax(content, "bash", theme="monokai", line_numbers=True)
+            panel = Panel(syntax, title=title, border_style="blue")
+            lines = self.console.render_lines(panel, new_lines=True)
+            
+            self._syntax_cache[key] = lines
+            if len(self._syntax_cache) > 8:
+                del self._syntax_cache[next(iter(self._syntax_cache))]
+        
+        return Segments(chain.from_iterable(lines))
     
     def _clear_script(self):
         """Clear the current script."""
@@ -411,18 +452,32 @@ Type [yellow]:done[/yellow] to finish editing, [yellow]:cancel[/yellow] to cance
             return
         
         self.script_lines = []
+        self._script_text_cache = None
         self.console.print(format_success("Script cleared."))
     
+    def _script_text(self) -> str:
+        """Get the current script as text, joining its lines only after edits."""
+        if self._script_text_cache is None:
+            self._script_text_cache = '\n'.join(self.script_lines)
+        return self._script_text_cache
+    
+    @staticmethod
+    def _hash_content(content: str) -> bytes:
+        """Hash script content for cheap saved/unsaved comparisons."""
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+    
     def _check_unsaved_changes(self) -> bool:
         """Check for unsaved changes and prompt user."""
         if not self.script_lines:
             return False
         
-        if self.current_script_name:
+        if self._saved_hash is not None:
+            if self._hash_content(self._script_text()) == self._saved_hash:
+                return False
+        elif self.current_script_name:
             try:
                 saved_content = self.script_manager.load_script(self.current_script_name)
-                current_content = '\n'.join(self.script_lines)
-                if saved_content == current_content:
+                if saved_content == self._script_text():
                     return False
             except FileNotFoundError:
                 pass  # Script not saved yet
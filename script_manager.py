@@ -2,12 +2,120 @@
 Script management functionality for saving, loading, and organizing bash scripts.
 """
 
+import atexit
+import functools
+import heapq
+import mmap
 import os
 import json
+import re
+import shutil
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from operator import attrgetter
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, NamedTuple, Optional, Tuple
 from datetime import datetime
 
+# Number of script contents kept in memory by ScriptManager.load_script
+_CONTENT_CACHE_SIZE = 16
+
+# Parsed metadata files shared by all managers:
+# absolute path -> (st_mtime_ns, st_size, metadata)
+_METADATA_CACHE: Dict[str, Tuple[int, int, Dict[str, Any]]] = {}
+
+# Managers whose pending metadata changes are written at interpreter exit;
+# held weakly so the registry never keeps a manager alive
+_LIVE_MANAGERS: "weakref.WeakSet[ScriptManager]" = weakref.WeakSet()
+# Set once the exit flush has run; finalizers must not retry during teardown
+_EXITING = False
+
+@atexit.register
+def _flush_live_managers() -> None:
+    """Write pending metadata of every manager still alive at exit."""
+    global _EXITING
+    _EXITING = True
+    
+    error = None
+    for manager in list(_LIVE_MANAGERS):
+        try:
+            manager.flush_metadata()
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+
+def _copy_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy metadata deep enough that per-script entries are not shared."""
+    return {name: dict(info) if isinstance(info, dict) else info
+            for name, info in metadata.items()}
+
+# (divisor, suffix, format) per power of 1024, indexed by bit_length // 10
+_SIZE_UNITS = (
+    (1, 'B', '{:.0f}{}'),
+    (1024, 'KB', '{:.1f}{}'),
+    (1024 ** 2, 'MB', '{:.1f}{}'),
+    (1024 ** 3, 'GB', '{:.1f}{}'),
+)
+
+# Metadata is machine-read only, so serialise it compactly, with orjson
+# when it is installed
+try:
+    import orjson
+    
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+    
+    _loads = json.loads
+
+# Flags for writing a script file; O_BINARY keeps Windows from translating
+# newlines at the descriptor level
+_SCRIPT_OPEN_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+
+# Anything that is not alphanumeric, '.', '_' or '-'
+_UNSAFE_NAME_CHARS = re.compile(r'[^\w.-]')
+
+@functools.lru_cache(maxsize=1024)
+def _sanitize(name: str) -> str:
+    """Turn a script name into its safe '.sh' filename."""
+    safe_name = _UNSAFE_NAME_CHARS.sub('', name)
+    if not safe_name:
+        raise ValueError("Invalid script name")
+    
+    if not safe_name.endswith('.sh'):
+        safe_name += '.sh'
+    
+    return safe_name
+
+def _read_via_mmap(path: Path) -> str:
+    """Read a UTF-8 text file by mapping it instead of read() copies."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if os.fstat(fd).st_size == 0:
+            # Empty files cannot be mapped
+            return ''
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mapped:
+            text = mapped[:].decode('utf-8')
+    finally:
+        os.close(fd)
+    
+    # Match text-mode reads, which translate \r\n and \r to \n
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+class ScriptInfo(NamedTuple):
+    """Summary of a saved script as shown in listings."""
+    name: str
+    size: str
+    modified: str
+    path: str
+
 class ScriptManager:
     """Manages bash script persistence and organization."""
     
@@ -18,36 +126,76 @@ class ScriptManager:
         # Metadata file for script information
         self.metadata_file = self.script_dir / ".metadata.json"
         self.metadata = self._load_metadata()
+        
+        # Metadata changes are written by flush_metadata(), at the latest when
+        # the manager is collected or the interpreter exits
+        self._dirty = False
+        _LIVE_MANAGERS.add(self)
+        
+        # filename -> (st_mtime_ns, st_size, content), least recently used first
+        self._content_cache: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
     
     def _load_metadata(self) -> Dict[str, Any]:
-        """Load script metadata from file."""
-        if self.metadata_file.exists():
-            try:
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, OSError):
-                pass
-        return {}
+        """Load script metadata from file, reusing an earlier parse if unchanged."""
+        try:
+            stat = self.metadata_file.stat()
+        except OSError:
+            return {}
+        
+        cache_key = os.path.abspath(self.metadata_file)
+        cached = _METADATA_CACHE.get(cache_key)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return _copy_metadata(cached[2])
+        
+        try:
+            with open(self.metadata_file, 'rb') as f:
+                metadata = _loads(f.read())
+        except (ValueError, OSError):
+            return {}
+        
+        _METADATA_CACHE[cache_key] = (stat.st_mtime_ns, stat.st_size, _copy_metadata(metadata))
+        return metadata
+    
+    def __enter__(self) -> "ScriptManager":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.flush_metadata()
+    
+    def __del__(self):
+        if not _EXITING and getattr(self, '_dirty', False):
+            self.flush_metadata()
     
-    def _save_metadata(self):
-        """Save script metadata to file."""
+    def flush_metadata(self):
+        """Write script metadata to file if it changed since the last write."""
+        if not self._dirty:
+            return
+        
+        # Write a sibling file and swap it in, so a crash mid-write can never
+        # leave a truncated .metadata.json behind
+        temp_file = self.metadata_file.with_suffix('.json.tmp')
         try:
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(self.metadata, f, indent=2)
+            with open(temp_file, 'wb') as f:
+                f.write(_dumps(self.metadata))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.metadata_file)
+            self._dirty = False
+            
+            stat = self.metadata_file.stat()
+            _METADATA_CACHE[os.path.abspath(self.metadata_file)] = (
+                stat.st_mtime_ns, stat.st_size, _copy_metadata(self.metadata)
+            )
         except OSError as e:
+            try:
+                temp_file.unlink()
+            except OSError:
+                pass
             raise Exception(f"Failed to save metadata: {e}")
     
     def _get_script_path(self, name: str) -> Path:
         """Get the full path for a script file."""
-        # Sanitize script name
-        safe_name = "".join(c for c in name if c.isalnum() or c in "._-")
-        if not safe_name:
-            raise ValueError("Invalid script name")
-        
-        if not safe_name.endswith('.sh'):
-            safe_name += '.sh'
-        
-        return self.script_dir / safe_name
+        return self.script_dir / _sanitize(name)
     
     def save_script(self, name: str, content: str) -> None:
         """Save a script to disk."""
@@ -57,46 +205,78 @@ class ScriptManager:
         script_path = self._get_script_path(name)
         
         try:
-            # Write script content
-            with open(script_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            # Make script executable
-            os.chmod(script_path, 0o755)
+            # Write script content, executable from the start; fchmod on the
+            # open descriptor also fixes existing files and the umask.
+            # os.fchmod is missing on Windows before Python 3.13, where the
+            # execute bit means nothing anyway.
+            data = content.encode('utf-8')
+            fd = os.open(script_path, _SCRIPT_OPEN_FLAGS, 0o755)
+            with os.fdopen(fd, 'wb') as f:
+                if hasattr(os, 'fchmod'):
+                    os.fchmod(fd, 0o755)
+                f.write(data)
+            self._content_cache.pop(script_path.name, None)
             
             # Update metadata
+            now = datetime.now().isoformat()
             self.metadata[name] = {
                 'filename': script_path.name,
-                'created': datetime.now().isoformat(),
-                'modified': datetime.now().isoformat(),
-                'size': len(content.encode('utf-8'))
+                'created': now,
+                'modified': now,
+                'size': len(data)
             }
-            self._save_metadata()
+            self._dirty = True
             
         except OSError as e:
             raise Exception(f"Failed to save script '{name}': {e}")
     
     def load_script(self, name: str) -> str:
-        """Load a script from disk."""
+        """Load a script from disk.
+        
+        Reads do not record an access time; see touch() for that.
+        """
         script_path = self._get_script_path(name)
         
-        if not script_path.exists():
+        try:
+            stat = script_path.stat()
+        except FileNotFoundError:
             raise FileNotFoundError(f"Script '{name}' not found")
         
         try:
-            with open(script_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Update last accessed time in metadata
-            if name in self.metadata:
-                self.metadata[name]['accessed'] = datetime.now().isoformat()
-                self._save_metadata()
+            cached = self._content_cache.get(script_path.name)
+            if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                content = cached[2]
+                self._content_cache.move_to_end(script_path.name)
+            else:
+                content = _read_via_mmap(script_path)
+                
+                self._content_cache[script_path.name] = (stat.st_mtime_ns, stat.st_size, content)
+                if len(self._content_cache) > _CONTENT_CACHE_SIZE:
+                    self._content_cache.popitem(last=False)
             
             return content
             
         except OSError as e:
             raise Exception(f"Failed to load script '{name}': {e}")
     
+    def touch(self, name: str) -> None:
+        """Record an access to a script in its file access time.
+        
+        The modification time is kept, so cached contents stay valid. This is
+        exact even on filesystems mounted with noatime or relatime.
+        """
+        script_path = self._get_script_path(name)
+        
+        try:
+            stat = script_path.stat()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Script '{name}' not found")
+        
+        try:
+            os.utime(script_path, ns=(time.time_ns(), stat.st_mtime_ns))
+        except OSError as e:
+            raise Exception(f"Failed to touch script '{name}': {e}")
+    
     def delete_script(self, name: str) -> None:
         """Delete a script from disk."""
         script_path = self._get_script_path(name)
@@ -106,43 +286,54 @@ class ScriptManager:
         
         try:
             script_path.unlink()
+            self._content_cache.pop(script_path.name, None)
             
             # Remove from metadata
             if name in self.metadata:
                 del self.metadata[name]
-                self._save_metadata()
+                self._dirty = True
                 
         except OSError as e:
             raise Exception(f"Failed to delete script '{name}': {e}")
     
-    def list_scripts(self) -> List[Dict[str, str]]:
-        """List all saved scripts with their information."""
-        scripts = []
+    def list_scripts(self, limit: Optional[int] = None, prefix: str = '') -> List[ScriptInfo]:
+        """List saved scripts with their information, sorted by name.
         
-        for script_file in self.script_dir.glob("*.sh"):
-            if script_file.name.startswith('.'):
-                continue
-            
-            name = script_file.stem
-            if script_file.name.endswith('.sh'):
-                name = script_file.name[:-3]  # Remove .sh extension
-            
-            try:
-                stat = script_file.stat()
-                size = self._format_size(stat.st_size)
-                modified = datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M")
+        Only names starting with prefix are included; when limit is given,
+        just the first limit scripts by name are returned.
+        """
+        scripts = self._iter_scripts(prefix)
+        
+        if limit is not None:
+            return heapq.nsmallest(limit, scripts, key=attrgetter('name'))
+        return sorted(scripts, key=attrgetter('name'))
+    
+    def _iter_scripts(self, prefix: str = '') -> Iterator[ScriptInfo]:
+        """Yield information for each saved script whose name starts with prefix."""
+        # One directory read; entries carry their name and file type
+        with os.scandir(self.script_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.name.endswith('.sh'):
+                    continue
                 
-                scripts.append({
-                    'name': name,
-                    'size': size,
-                    'modified': modified,
-                    'path': str(script_file)
-                })
+                name = entry.name[:-3]  # Remove .sh extension
+                if not name.startswith(prefix):
+                    continue
                 
-            except OSError:
-                continue
-        
-        return sorted(scripts, key=lambda x: x['name'])
+                try:
+                    if not entry.is_file():
+                        continue
+                    
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                
+                yield ScriptInfo(
+                    name=name,
+                    size=self._format_size(stat.st_size),
+                    modified=time.strftime("%Y-%m-%d %H:%M", time.localtime(stat.st_mtime)),
+                    path=entry.path
+                )
     
     def script_exists(self, name: str) -> bool:
         """Check if a script exists."""
@@ -173,44 +364,50 @@ class ScriptManager:
             if name in self.metadata:
                 info.update(self.metadata[name])
             
+            # Access time comes from the filesystem, never from older metadata
+            info['accessed'] = datetime.fromtimestamp(stat.st_atime).isoformat()
+            
             return info
             
         except OSError as e:
             raise Exception(f"Failed to get script info: {e}")
     
-    def _format_size(self, size_bytes: int) -> str:
+    @staticmethod
+    def _format_size(size_bytes: int) -> str:
         """Format file size in human-readable format."""
-        if size_bytes < 1024:
-            return f"{size_bytes}B"
-        elif size_bytes < 1024 * 1024:
-            return f"{size_bytes / 1024:.1f}KB"
-        else:
-            return f"{size_bytes / (1024 * 1024):.1f}MB"
+        index = min(max(size_bytes.bit_length() - 1, 0) // 10, len(_SIZE_UNITS) - 1)
+        divisor, unit, template = _SIZE_UNITS[index]
+        return template.format(size_bytes / divisor, unit)
     
     def backup_scripts(self, backup_dir: Path) -> None:
         """Create a backup of all scripts."""
         backup_dir = Path(backup_dir)
-        backup_dir.mkdir(exist_ok=True)
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_path = backup_dir / f"scripts_backup_{timestamp}"
-        backup_path.mkdir()
+        backup_path.mkdir(parents=True, exist_ok=True)
+        
+        # Make sure pending metadata changes are part of the backup
+        self.flush_metadata()
         
         try:
-            # Copy all script files
-            for script_file in self.script_dir.glob("*.sh"):
-                if not script_file.name.startswith('.'):
-                    (backup_path / script_file.name).write_text(
-                        script_file.read_text(encoding='utf-8'),
-                        encoding='utf-8'
-                    )
+            with os.scandir(self.script_dir) as entries:
+                script_files = [entry for entry in entries
+                                if entry.name.endswith('.sh') and not entry.name.startswith('.')
+                                and entry.is_file()]
+            
+            # Copy all script files concurrently; copy2 keeps mode and mtime and
+            # releases the GIL while the kernel moves the bytes. Consuming the
+            # results re-raises the first copy that failed.
+            with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 4)) as pool:
+                list(pool.map(
+                    lambda entry: shutil.copy2(entry.path, backup_path / entry.name),
+                    script_files
+                ))
             
             # Copy metadata
             if self.metadata_file.exists():
-                (backup_path / ".metadata.json").write_text(
-                    self.metadata_file.read_text(encoding='utf-8'),
-                    encoding='utf-8'
-                )
+                shutil.copy2(self.metadata_file, backup_path / ".metadata.json")
             
         except OSError as e:
             raise Exception(f"Failed to create backup: {e}")
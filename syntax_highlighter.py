@@ -4,14 +4,22 @@ Bash syntax highlighting for terminal display.
 
 import re
 from typing import List, Tuple, Dict, Any
-from rich.text import Text
-from rich.console import Console
+from rich.text import Span, Text
+
+from utils import CONSOLE
+
+# Tokens that matter for bracket balancing: escapes, complete quoted strings,
+# a quote left open until end of line, and the brackets themselves
+_BALANCE_TOKEN = re.compile(
+    r"""\\.|'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|['"]|[{}()\[\]]""",
+    re.DOTALL
+)
 
 class BashSyntaxHighlighter:
     """Provides syntax highlighting for bash scripts."""
     
     def __init__(self):
-        self.console = Console()
+        self.console = CONSOLE
         
         # Define bash syntax patterns
         self.patterns = {
@@ -26,52 +34,36 @@ class BashSyntaxHighlighter:
             'option': (r'\s-[a-zA-Z0-9]+|\s--[a-zA-Z0-9-]+', 'green'),
             'shebang': (r'^#!.*$', 'bright_blue'),
         }
+        
+        # All patterns as one alternation, so a line is tokenized in a single
+        # scan; earlier patterns win where several match at the same position
+        self._master = re.compile(
+            '|'.join(f'(?P<{name}>{regex})' for name, (regex, _) in self.patterns.items()),
+            re.MULTILINE
+        )
+        self._styles = {name: style for name, (_, style) in self.patterns.items()}
     
     def highlight(self, code: str) -> Text:
         """Apply syntax highlighting to bash code."""
-        text = Text()
-        lines = code.split('\n')
+        spans = []
+        offset = 0
         
-        for i, line in enumerate(lines):
-            if i > 0:
-                text.append('\n')
-            
-            highlighted_line = self._highlight_line(line)
-            text.append(highlighted_line)
+        for line in code.split('\n'):
+            spans.extend(self._line_spans(line, offset))
+            offset += len(line) + 1
         
-        return text
+        return Text(code, spans=spans)
     
     def _highlight_line(self, line: str) -> Text:
         """Highlight a single line of bash code."""
-        text = Text()
-        pos = 0
-        length = len(line)
-        
-        # Track which parts of the line have been highlighted
-        highlighted = [False] * length
-        
-        # Apply highlighting patterns in order of priority
-        for pattern_name, (regex, style) in self.patterns.items():
-            for match in re.finditer(regex, line, re.MULTILINE):
-                start, end = match.span()
-                
-                # Only highlight if this part hasn't been highlighted yet
-                if not any(highlighted[start:end]):
-                    # Mark this region as highlighted
-                    highlighted[start:end] = [True] * (end - start)
-                    
-                    # Add the text with highlighting
-                    if start > pos:
-                        text.append(line[pos:start])
-                    
-                    text.append(line[start:end], style=style)
-                    pos = end
-        
-        # Add any remaining unhighlighted text
-        if pos < length:
-            text.append(line[pos:])
-        
-        return text
+        return Text(line, spans=self._line_spans(line))
+    
+    def _line_spans(self, line: str, offset: int = 0) -> List[Span]:
+        """Style spans for one line's tokens, shifted by offset into the full text."""
+        return [
+            Span(offset + match.start(), offset + match.end(), self._styles[match.lastgroup])
+            for match in self._master.finditer(line)
+        ]
     
     def highlight_to_console(self, code: str, line_numbers: bool = True) -> None:
         """Print highlighted code to console."""
@@ -105,6 +97,12 @@ class BashSyntaxHighlighter:
         brace_stack = []
         paren_stack = []
         bracket_stack = []
+        openers = {'{': brace_stack, '(': paren_stack, '[': bracket_stack}
+        closers = {
+            '}': (brace_stack, 'brace'),
+            ')': (paren_stack, 'parenthesis'),
+            ']': (bracket_stack, 'bracket'),
+        }
         
         for line_num, line in enumerate(lines, 1):
             stripped = line.strip()
@@ -113,77 +111,34 @@ class BashSyntaxHighlighter:
             if not stripped or stripped.startswith('#'):
                 continue
             
-            # Check for unmatched quotes (basic check)
-            in_single_quote = False
-            in_double_quote = False
-            escaped = False
-            
-            for i, char in enumerate(line):
-                if escaped:
-                    escaped = False
-                    continue
+            # Balance brackets outside quotes; quoted strings and escapes are
+            # consumed whole by the tokenizer
+            for match in _BALANCE_TOKEN.finditer(line):
+                token = match.group()
                 
-                if char == '\\':
-                    escaped = True
-                    continue
+                if token == "'" or token == '"':
+                    # Check for unmatched quotes at end of line
+                    errors.append({
+                        'line': line_num,
+                        'column': len(line),
+                        'message': 'Unmatched single quote' if token == "'" else 'Unmatched double quote',
+                        'type': 'syntax'
+                    })
+                    break
                 
-                if char == "'" and not in_double_quote:
-                    in_single_quote = not in_single_quote
-                elif char == '"' and not in_single_quote:
-                    in_double_quote = not in_double_quote
-                elif not in_single_quote and not in_double_quote:
-                    if char == '{':
-                        brace_stack.append((line_num, i))
-                    elif char == '}':
-                        if not brace_stack:
-                            errors.append({
-                                'line': line_num,
-                                'column': i,
-                                'message': 'Unmatched closing brace',
-                                'type': 'syntax'
-                            })
-                        else:
-                            brace_stack.pop()
-                    elif char == '(':
-                        paren_stack.append((line_num, i))
-                    elif char == ')':
-                        if not paren_stack:
-                            errors.append({
-                                'line': line_num,
-                                'column': i,
-                                'message': 'Unmatched closing parenthesis',
-                                'type': 'syntax'
-                            })
-                        else:
-                            paren_stack.pop()
-                    elif char == '[':
-                        bracket_stack.append((line_num, i))
-                    elif char == ']':
-                        if not bracket_stack:
-                            errors.append({
-                                'line': line_num,
-                                'column': i,
-                                'message': 'Unmatched closing bracket',
-                                'type': 'syntax'
-                            })
-                        else:
-                            bracket_stack.pop()
-            
-            # Check for unmatched quotes at end of line
-            if in_single_quote:
-                errors.append({
-                    'line': line_num,
-                    'column': len(line),
-                    'message': 'Unmatched single quote',
-                    'type': 'syntax'
-                })
-            elif in_double_quote:
-                errors.append({
-                    'line': line_num,
-                    'column': len(line),
-                    'message': 'Unmatched double quote',
-                    'type': 'syntax'
-                })
+                if token in openers:
+                    openers[token].append((line_num, match.start()))
+                elif token in closers:
+                    stack, name = closers[token]
+                    if not stack:
+                        errors.append({
+                            'line': line_num,
+                            'column': match.start(),
+                            'message': f'Unmatched closing {name}',
+                            'type': 'syntax'
+                        })
+                    else:
+                        stack.pop()
             
             # Check for common bash syntax issues
             if re.search(r'\bif\b.*\bthen\b', stripped) and not stripped.endswith('then'):